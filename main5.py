@@ -1,11 +1,21 @@
 import sys
+import argparse
+import bisect
 import datetime
+import gc
+import gzip
 import json
 import os
+import threading
+import time
+from collections import OrderedDict, deque
 from PySide6 import QtWidgets, QtCore, QtGui
 from PySide6.QtUiTools import QUiLoader # PySide6 載入 UI 的工具
 from PySide6.QtWidgets import QVBoxLayout, QMessageBox, QCompleter, QGridLayout, QLineEdit, QPushButton
 from PySide6.QtCore import QThread, Signal
+import shiboken6
+import numpy as np
+import pandas as pd
 import yfinance as yf
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
@@ -154,6 +164,442 @@ class SimpleCalculator(QtWidgets.QWidget):
 
 
 
+class VirtualClock:
+    """程式共用的時鐘；重播模式下可加速，讓計時器與時間顯示跟著虛擬時間走"""
+    
+    def __init__(self, speed=1.0, origin=None):
+        self.reset(speed, origin)
+    
+    def reset(self, speed=1.0, origin=None):
+        """重新設定速度與起點（origin 為虛擬時間的起始日期時間）"""
+        self.speed = speed
+        self.origin = origin or datetime.datetime.now()
+        self._start = time.monotonic()
+    
+    def elapsed(self):
+        """從起點經過的虛擬秒數"""
+        return (time.monotonic() - self._start) * self.speed
+    
+    def now(self):
+        """目前的虛擬日期時間"""
+        return self.origin + datetime.timedelta(seconds=self.elapsed())
+    
+    def interval(self, msec):
+        """把真實的計時器間隔（毫秒）換算成加速後的間隔"""
+        return max(1, int(msec / self.speed))
+
+
+# 全程式共用的時鐘（預設即為真實時間）
+market_clock = VirtualClock()
+
+
+class QuoteCache:
+    """行程內共用的報價快取：短 TTL、超過記憶體上限時依 LRU 淘汰，
+    並把同一鍵值的同時請求合併成一次上游呼叫"""
+    
+    def __init__(self, ttl=5.0, max_bytes=64 * 1024 * 1024, sizeof=sys.getsizeof, clock=time.monotonic):
+        self.ttl = ttl  # 秒
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof  # 估算單筆資料佔用的位元組
+        self.clock = clock
+        self.current_bytes = 0
+        
+        self._entries = OrderedDict()  # {key: (過期時間, 大小, 資料)}，越後面越常用
+        self._inflight = {}  # {key: 進行中的請求}
+        self._lock = threading.Lock()
+        
+        # 統計計數
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+    
+    def get_or_fetch(self, key, loader):
+        """取得快取資料；沒有或已過期時呼叫 loader，同一鍵值同時只會有一個 loader 在執行"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > self.clock():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[2]
+                self._remove(key)
+            
+            flight = self._inflight.get(key)
+            if flight is None:
+                flight = {'event': threading.Event(), 'value': None, 'error': None}
+                self._inflight[key] = flight
+                self.misses += 1
+                is_leader = True
+            else:
+                self.coalesced += 1
+                is_leader = False
+        
+        # 其他執行緒已在抓同一筆資料，等它完成後共用結果
+        if not is_leader:
+            flight['event'].wait()
+            if flight['error'] is not None:
+                raise flight['error']
+            return flight['value']
+        
+        try:
+            value = loader()
+            flight['value'] = value
+            self._store(key, value)
+            return value
+        except Exception as e:
+            flight['error'] = e  # 錯誤不快取，但會傳給所有等待者
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight['event'].set()
+    
+    def _store(self, key, value):
+        """寫入快取，必要時淘汰最久未使用的資料"""
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            while self._entries and self.current_bytes + size > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+            self._entries[key] = (self.clock() + self.ttl, size, value)
+            self.current_bytes += size
+    
+    def _remove(self, key):
+        """移除一筆資料（呼叫前需持有鎖）"""
+        _, size, _ = self._entries.pop(key)
+        self.current_bytes -= size
+    
+    def clear(self):
+        """清空快取"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+    
+    def stats(self):
+        """回傳命中、未命中與合併次數等統計"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+            }
+
+
+def history_sizeof(value):
+    """估算 (代號, 名稱, 歷史資料) 快取項目佔用的記憶體"""
+    final_code, stock_name, hist = value
+    return int(hist.memory_usage(index=True, deep=True).sum()) + sys.getsizeof(final_code) + sys.getsizeof(stock_name)
+
+
+# 全程式共用的報價快取（自動更新、時間區間按鈕、我的最愛與手動搜尋都經過這裡）
+quote_cache = QuoteCache(sizeof=history_sizeof, clock=market_clock.elapsed)
+
+
+def quote_key(raw_code, yf_period, interval):
+    """行情資料的鍵值，報價快取與錄製/重播檔共用同一個順序"""
+    return (raw_code, yf_period, interval)
+
+
+def download_history(raw_code, yf_period, interval):
+    """向 Yahoo Finance 下載歷史資料，回傳 (最終代號, 股票名稱, 歷史資料)"""
+    final_code = raw_code
+    if raw_code.isdigit():
+        final_code = f"{raw_code}.TW"
+    
+    stock = yf.Ticker(final_code)
+    if interval:
+        hist = stock.history(period=yf_period, interval=interval)
+    else:
+        hist = stock.history(period=yf_period)
+    
+    # 如果 .TW 找不到且輸入的是數字，嘗試切換成上櫃 .TWO
+    if hist.empty and raw_code.isdigit():
+        final_code = f"{raw_code}.TWO"
+        stock = yf.Ticker(final_code)
+        if interval:
+            hist = stock.history(period=yf_period, interval=interval)
+        else:
+            hist = stock.history(period=yf_period)
+    
+    if hist.empty:
+        raise ValueError(f"找不到 {raw_code} 的資料")
+    
+    # 取得股票名稱
+    try:
+        info = stock.info
+        stock_name = info.get('longName') or info.get('shortName') or final_code
+    except Exception:
+        stock_name = final_code
+    
+    return final_code, stock_name, hist
+
+
+def encode_history(hist):
+    """把歷史資料轉成可寫入 JSON 的精簡格式（時間以 UTC 秒為單位）"""
+    index = hist.index if hist.index.tz is None else hist.index.tz_convert(None)
+    return {
+        'tz': str(hist.index.tz) if hist.index.tz is not None else None,
+        'name': hist.index.name,
+        'index': ((index - pd.Timestamp(0)) // pd.Timedelta(seconds=1)).tolist(),
+        'columns': list(hist.columns),
+        'dtypes': [str(dtype) for dtype in hist.dtypes],
+        'data': hist.to_numpy(dtype=float).tolist(),
+    }
+
+
+def decode_history(bars):
+    """把 encode_history 的結果還原成 DataFrame"""
+    index = pd.to_datetime(bars['index'], unit='s', utc=True)
+    if bars['tz']:
+        index = index.tz_convert(bars['tz'])
+    else:
+        index = index.tz_localize(None)
+    index.name = bars['name']
+    
+    hist = pd.DataFrame(bars['data'], index=index, columns=bars['columns'], dtype=float)
+    return hist.astype(dict(zip(bars['columns'], bars['dtypes'])))
+
+
+def diff_history(prev, hist):
+    """比較前後兩份歷史資料，回傳 (drop, keep, 新增的列)：
+    新資料 = prev 去掉前 drop 列後的前 keep 列，再接上新增的列"""
+    if prev is None or hist.empty or not prev.columns.equals(hist.columns):
+        return 0, 0, hist
+    
+    drop = prev.index.get_indexer([hist.index[0]])[0]
+    if drop < 0:
+        return 0, 0, hist
+    
+    overlap = prev.iloc[drop:]
+    n = min(len(overlap), len(hist))
+    old = overlap.to_numpy(dtype=float)[:n]
+    new = hist.to_numpy(dtype=float)[:n]
+    same = ((old == new) | (np.isnan(old) & np.isnan(new))).all(axis=1)
+    same &= overlap.index[:n] == hist.index[:n]
+    
+    keep = n if same.all() else int(np.argmin(same))
+    return drop, keep, hist.iloc[keep:]
+
+
+class MarketRecorder:
+    """包住資料來源，把每次上游下載的結果寫入錄製檔（gzip 壓縮的 JSON Lines，
+    同一檔股票只記錄與上一筆相比新增或變動的 K 棒）"""
+    
+    def __init__(self, source, path, clock=market_clock):
+        self.source = source
+        self.path = path
+        self.clock = clock
+        self._last = {}  # {key: 上一次的歷史資料}
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, 'wt', encoding='utf-8')
+        self._write({'version': 1, 'origin': clock.now().isoformat()})
+    
+    def __call__(self, raw_code, yf_period, interval):
+        final_code, stock_name, hist = self.source(raw_code, yf_period, interval)
+        key = quote_key(raw_code, yf_period, interval)
+        
+        with self._lock:
+            drop, keep, bars = diff_history(self._last.get(key), hist)
+            self._last[key] = hist
+            self._write({
+                't': round(self.clock.elapsed(), 3),
+                'key': list(key),
+                'final_code': final_code,
+                'stock_name': stock_name,
+                'drop': int(drop),
+                'keep': int(keep),
+                'bars': encode_history(bars),
+            })
+        return final_code, stock_name, hist
+    
+    def _write(self, record):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(',', ':')) + "\n")
+        self._file.flush()
+    
+    def close(self):
+        """結束錄製"""
+        with self._lock:
+            self._file.close()
+
+
+class MarketReplayer:
+    """讀取錄製檔並依虛擬時鐘回放，取代 Yahoo Finance 作為資料來源（可完全離線）"""
+    
+    def __init__(self, path, clock=market_clock):
+        self.clock = clock
+        self.origin = None
+        self.duration = 0.0
+        self._times = {}  # {key: [錄製時間...]}
+        self._records = {}  # {key: [差異紀錄...]}
+        self._cursor = {}  # {key: (目前還原到第幾筆, 還原出的資料)}
+        self._lock = threading.Lock()
+        self.load(path)
+    
+    def load(self, path):
+        """讀取錄製檔（K 棒等到實際回放時才還原）"""
+        lines = []
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            try:
+                for line in f:
+                    lines.append(line)
+            except EOFError:
+                pass  # 錄製中斷時檔尾不完整，使用已讀到的部分
+        
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            if 'version' in record:
+                self.origin = datetime.datetime.fromisoformat(record['origin'])
+                continue
+            
+            key = quote_key(*record['key'])
+            self._records.setdefault(key, []).append(record)
+            self._times.setdefault(key, []).append(record['t'])
+            self.duration = max(self.duration, record['t'])
+    
+    def targets(self):
+        """錄製檔中可在主畫面回放的 (股票代號, 時間區間)，依首次出現的順序排列"""
+        periods = {config: period for period, config in PERIOD_CONFIG.items()}
+        targets = []
+        for raw_code, yf_period, interval in self._records:
+            period = periods.get((yf_period, interval))
+            if period is not None and (raw_code, period) not in targets:
+                targets.append((raw_code, period))
+        return targets
+    
+    @property
+    def finished(self):
+        """虛擬時間是否已超過錄製的最後一筆"""
+        return self.clock.elapsed() > self.duration
+    
+    def snapshot(self, key, position):
+        """依差異紀錄還原第 position 筆的 (最終代號, 股票名稱, 歷史資料)"""
+        records = self._records[key]
+        current, snapshot = self._cursor.get(key, (-1, None))
+        if position < current:
+            current, snapshot = -1, None
+        
+        # 從最近一筆完整紀錄開始往後套用，不必從頭還原
+        for start in range(position, current, -1):
+            if not (records[start]['drop'] or records[start]['keep']):
+                current, snapshot = start - 1, None
+                break
+        
+        for record in records[current + 1:position + 1]:
+            bars = decode_history(record['bars'])
+            if snapshot is not None and (record['drop'] or record['keep']):
+                kept = snapshot[2].iloc[record['drop']:record['drop'] + record['keep']]
+                hist = pd.concat([kept, bars]) if not bars.empty else kept
+            else:
+                hist = bars
+            snapshot = (record['final_code'], record['stock_name'], hist)
+        
+        self._cursor[key] = (position, snapshot)
+        return snapshot
+    
+    def __call__(self, raw_code, yf_period, interval):
+        key = quote_key(raw_code, yf_period, interval)
+        if key not in self._records:
+            raise ValueError(f"找不到 {raw_code} 的資料")
+        
+        # 取虛擬時間當下最新的一筆；還沒到第一筆時就用第一筆
+        position = bisect.bisect_right(self._times[key], self.clock.elapsed()) - 1
+        with self._lock:
+            return self.snapshot(key, max(position, 0))
+
+
+class FixtureMarketSource:
+    """離線測試用的合成行情：固定亂數種子的隨機漫步，每次呼叫最後一根 K 棒會小幅變動"""
+    
+    def __init__(self, bars=120, seed=0):
+        self.bars = bars
+        self.seed = seed
+        self.calls = 0
+        self._lock = threading.Lock()
+    
+    def __call__(self, raw_code, yf_period, interval):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        
+        freq = 'h' if interval == '1h' else 'B'
+        index = pd.date_range(end='2026-01-02', periods=self.bars, freq=freq, tz='Asia/Taipei', name='Date')
+        rng = np.random.default_rng(self.seed + sum(map(ord, raw_code)))
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, self.bars)))
+        close[-1] *= 1 + 0.001 * np.sin(calls)
+        
+        hist = pd.DataFrame({
+            'Open': close * 0.998,
+            'High': close * 1.01,
+            'Low': close * 0.99,
+            'Close': close,
+            'Volume': rng.integers(1000, 100000, self.bars),
+        }, index=index)
+        return f"{raw_code}.TW", raw_code, hist
+
+
+# 目前的資料來源：預設直接向 Yahoo Finance 下載，可換成錄製或重播
+market_source = download_history
+
+
+# 根據時間區間設定正確的 period 和 interval
+PERIOD_CONFIG = {
+    "1d": ("5d", "1h"),      # 過去 5 天，1 小時粒度（顯示最近 1 天的走勢）
+    "1w": ("1mo", "1d"),     # 過去 1 月，1 天粒度（包含約 1 週的交易日）
+    "1mo": ("3mo", "1d"),    # 過去 3 月，1 天粒度
+    "3mo": ("6mo", "1d"),    # 過去 6 月，1 天粒度
+    "1y": ("1y", "1d")       # 過去 1 年，1 天粒度
+}
+
+
+def fetch_stock_data(code, period="1mo"):
+    """抓取單一股票數據並整理成結果字典（查無資料時拋出 ValueError）"""
+    raw_code = code.strip().upper()
+    
+    if not raw_code:
+        raise ValueError("請輸入股票代號")
+    
+    yf_period, interval = PERIOD_CONFIG.get(period, ("1mo", None))
+    
+    final_code, stock_name, hist = quote_cache.get_or_fetch(
+        quote_key(raw_code, yf_period, interval),
+        lambda: market_source(raw_code, yf_period, interval)
+    )
+    
+    # 計算數據
+    current_price = hist['Close'].iloc[-1]
+    prev_close = hist['Close'].iloc[-2]
+    change = current_price - prev_close
+    change_pct = (change / prev_close) * 100
+    
+    day_high = hist['High'].iloc[-1]
+    day_low = hist['Low'].iloc[-1]
+    day_open = hist['Open'].iloc[-1]  # 新增：當日開盤價
+    
+    # 構建結果字典
+    return {
+        'final_code': final_code,
+        'stock_name': stock_name,
+        'current_price': current_price,
+        'prev_close': prev_close,
+        'change': change,
+        'change_pct': change_pct,
+        'day_high': day_high,
+        'day_low': day_low,
+        'day_open': day_open,  # 新增
+        'hist': hist,
+        'period': period,
+        'success': True
+    }
+
+
 class StockFetchWorker(QThread):
     """在後台執行緒中抓取股票數據，避免 UI 卡頓"""
     
@@ -163,97 +609,773 @@ class StockFetchWorker(QThread):
     
     def __init__(self, code, period="1mo"):
         super().__init__()
+        ResourceTelemetry.track(self)
         self.code = code
         self.period = period  # 儲存原始 period（"1h", "1d", "3d", "1mo"）
     
     def run(self):
         """執行緒的主函數"""
-        import time
         start_time = time.time()
         
         try:
-            raw_code = self.code.strip().upper()
-            
-            if not raw_code:
-                self.error_occurred.emit("請輸入股票代號")
-                return
-            
-            final_code = raw_code
-            if raw_code.isdigit():
-                final_code = f"{raw_code}.TW"
-            
-            # 根據時間區間設定正確的 period 和 interval
-            period_config = {
-                "1d": ("5d", "1h"),      # 過去 5 天，1 小時粒度（顯示最近 1 天的走勢）
-                "1w": ("1mo", "1d"),     # 過去 1 月，1 天粒度（包含約 1 週的交易日）
-                "1mo": ("3mo", "1d"),    # 過去 3 月，1 天粒度
-                "3mo": ("6mo", "1d"),    # 過去 6 月，1 天粒度
-                "1y": ("1y", "1d")       # 過去 1 年，1 天粒度
-            }
-            
-            period, interval = period_config.get(self.period, ("1mo", None))
-            
-            stock = yf.Ticker(final_code)
-            if interval:
-                hist = stock.history(period=period, interval=interval)
-            else:
-                hist = stock.history(period=period)
-            
-            # 如果 .TW 找不到且輸入的是數字，嘗試切換成上櫃 .TWO
-            if hist.empty and raw_code.isdigit():
-                final_code = f"{raw_code}.TWO"
-                stock = yf.Ticker(final_code)
-                if interval:
-                    hist = stock.history(period=period, interval=interval)
-                else:
-                    hist = stock.history(period=period)
-            
-            if hist.empty:
-                self.error_occurred.emit(f"找不到 {raw_code} 的資料")
-                return
-            
-            # 取得股票名稱
-            try:
-                info = stock.info
-                stock_name = info.get('longName') or info.get('shortName') or final_code
-            except Exception:
-                stock_name = final_code
-            
-            # 計算數據
-            current_price = hist['Close'].iloc[-1]
-            prev_close = hist['Close'].iloc[-2]
-            change = current_price - prev_close
-            change_pct = (change / prev_close) * 100
-            
-            day_high = hist['High'].iloc[-1]
-            day_low = hist['Low'].iloc[-1]
-            day_open = hist['Open'].iloc[-1]  # 新增：當日開盤價
-            
-            # 構建結果字典
-            result = {
-                'final_code': final_code,
-                'stock_name': stock_name,
-                'current_price': current_price,
-                'prev_close': prev_close,
-                'change': change,
-                'change_pct': change_pct,
-                'day_high': day_high,
-                'day_low': day_low,
-                'day_open': day_open,  # 新增
-                'hist': hist,
-                'period': self.period,
-                'start_time': start_time,
-                'success': True
-            }
-            
+            result = fetch_stock_data(self.code, self.period)
+            result['start_time'] = start_time
             self.data_ready.emit(result)
         
+        except ValueError as e:
+            self.error_occurred.emit(str(e))
         except Exception as e:
             self.error_occurred.emit(f"讀取異常：{str(e)}")
 
 
+def decimate_minmax(values, buckets):
+    """將數列依像素寬度分桶，每桶只保留最小值與最大值（保留走勢的上下包絡）"""
+    values = np.asarray(values, dtype=float)
+    values = values[~np.isnan(values)]
+    if buckets <= 0 or len(values) <= buckets * 2:
+        return values
+    
+    edges = np.linspace(0, len(values), buckets + 1).astype(int)[:-1]
+    mins = np.minimum.reduceat(values, edges)
+    maxs = np.maximum.reduceat(values, edges)
+    return np.column_stack((mins, maxs)).ravel()
+
+
+class FavoritesFetchWorker(QThread):
+    """在後台執行緒中依序抓取多檔股票，每完成一檔就送出結果"""
+    
+    tile_ready = Signal(str, dict)  # (原始代號, 數據字典)
+    tile_failed = Signal(str, str)  # (原始代號, 錯誤訊息)
+    
+    def __init__(self, codes, period="1mo"):
+        super().__init__()
+        ResourceTelemetry.track(self)
+        self.codes = list(codes)
+        self.period = period
+    
+    def run(self):
+        """執行緒的主函數"""
+        for code in self.codes:
+            if self.isInterruptionRequested():
+                return
+            try:
+                self.tile_ready.emit(code, fetch_stock_data(code, self.period))
+            except Exception as e:
+                self.tile_failed.emit(code, str(e))
+
+
+class SparklineTile(QtWidgets.QWidget):
+    """單一股票的迷你卡片：價格、漲跌幅與走勢線，直接用 QPainter 繪製"""
+    
+    TILE_WIDTH = 220
+    TILE_HEIGHT = 110
+    
+    def __init__(self, code, parent=None):
+        super().__init__(parent)
+        self.code = code
+        self.stock_name = code
+        self.price = None
+        self.change_pct = None
+        self.closes = np.empty(0)  # 已抽樣的收盤價（快取）
+        self.error = None
+        self.dark_mode = False
+        self._path = None  # 快取的走勢線路徑，資料或尺寸改變時才重建
+        self._path_size = None
+        
+        self.setFixedSize(self.TILE_WIDTH, self.TILE_HEIGHT)
+        # 每次都會畫滿整個卡片，不需要 Qt 先清除背景
+        self.setAttribute(QtCore.Qt.WA_OpaquePaintEvent)
+    
+    def set_data(self, stock_name, price, change_pct, closes):
+        """更新卡片資料，只有內容真的改變時才重繪，回傳是否有重繪"""
+        closes = decimate_minmax(closes, self.width())
+        if (self.error is None and price == self.price and change_pct == self.change_pct
+                and stock_name == self.stock_name and np.array_equal(closes, self.closes)):
+            return False
+        
+        self.stock_name = stock_name
+        self.price = price
+        self.change_pct = change_pct
+        self.closes = closes
+        self.error = None
+        self.setToolTip("")
+        self._path = None
+        self.update()
+        return True
+    
+    def set_error(self, error_msg):
+        """顯示錯誤訊息（保留舊資料）"""
+        if error_msg == self.error:
+            return
+        self.error = error_msg
+        self.setToolTip(error_msg)
+        self.update()
+    
+    def set_dark_mode(self, dark_mode):
+        """切換深色/淺色配色"""
+        if dark_mode != self.dark_mode:
+            self.dark_mode = dark_mode
+            self.update()
+    
+    def chart_rect(self):
+        """走勢線的繪製範圍"""
+        return QtCore.QRectF(8, 52, self.width() - 16, self.height() - 60)
+    
+    def build_path(self):
+        """依快取的收盤價建立走勢線路徑"""
+        path = QtGui.QPainterPath()
+        if len(self.closes) < 2:
+            return path
+        
+        rect = self.chart_rect()
+        low = self.closes.min()
+        span = self.closes.max() - low or 1.0
+        xs = np.linspace(rect.left(), rect.right(), len(self.closes))
+        ys = rect.bottom() - (self.closes - low) / span * rect.height()
+        
+        path.moveTo(xs[0], ys[0])
+        for x, y in zip(xs[1:].tolist(), ys[1:].tolist()):
+            path.lineTo(x, y)
+        return path
+    
+    def paintEvent(self, event):
+        """繪製卡片"""
+        if self._path is None or self._path_size != self.size():
+            self._path = self.build_path()
+            self._path_size = self.size()
+        
+        # 漲紅跌綠，與主畫面一致
+        if self.change_pct is None or self.change_pct == 0:
+            color = QtGui.QColor("#666666")
+        elif self.change_pct > 0:
+            color = QtGui.QColor("#FF4444")
+        else:
+            color = QtGui.QColor("#00AA00")
+        
+        if self.dark_mode:
+            background, border, text_color = "#2D2D2D", "#404040", "#E0E0E0"
+        else:
+            background, border, text_color = "#FFFFFF", "#CCCCCC", "#333333"
+        
+        painter = QtGui.QPainter(self)
+        painter.fillRect(self.rect(), QtGui.QColor(background))
+        painter.setPen(QtGui.QColor(border))
+        painter.drawRect(self.rect().adjusted(0, 0, -1, -1))
+        
+        painter.setPen(QtGui.QColor(text_color))
+        painter.setFont(QtGui.QFont('Arial', 10, QtGui.QFont.Bold))
+        painter.drawText(QtCore.QRectF(8, 4, self.width() - 16, 20),
+                         QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter, self.code)
+        
+        if self.error is not None and self.price is None:
+            painter.setFont(QtGui.QFont('Arial', 9))
+            painter.drawText(QtCore.QRectF(8, 28, self.width() - 16, self.height() - 36),
+                             QtCore.Qt.AlignLeft | QtCore.Qt.TextWordWrap, self.error)
+            painter.end()
+            return
+        
+        if self.price is not None:
+            painter.setPen(color)
+            painter.drawText(QtCore.QRectF(8, 4, self.width() - 16, 20),
+                             QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter,
+                             f"{self.change_pct:+.2f}%")
+            painter.setFont(QtGui.QFont('Arial', 14, QtGui.QFont.Bold))
+            painter.drawText(QtCore.QRectF(8, 24, self.width() - 16, 24),
+                             QtCore.Qt.AlignLeft | QtCore.Qt.AlignVCenter,
+                             f"$ {self.price:.2f}")
+        
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.setPen(QtGui.QPen(color, 1.5))
+        painter.drawPath(self._path)
+        
+        # 更新失敗但仍保留舊資料時，把卡片調暗並標示，避免誤以為是最新價格
+        if self.error is not None:
+            dim = QtGui.QColor(background)
+            dim.setAlpha(160)
+            painter.fillRect(self.rect(), dim)
+            painter.setPen(QtGui.QColor("#FF9500"))
+            painter.setFont(QtGui.QFont('Arial', 10, QtGui.QFont.Bold))
+            painter.drawText(QtCore.QRectF(8, 4, self.width() - 16, self.height() - 8),
+                             QtCore.Qt.AlignRight | QtCore.Qt.AlignBottom, "⚠ 資料未更新")
+        painter.end()
+
+
+class SparklineDashboard(QtWidgets.QWidget):
+    """我的最愛總覽：以網格顯示每檔股票的即時價格與迷你走勢"""
+    
+    REFRESH_INTERVAL = 10000  # 共用的更新排程（毫秒）
+    PERIOD = "1mo"
+    
+    def __init__(self, codes=None):
+        super().__init__()
+        self.setWindowTitle("我的最愛總覽")
+        self.resize(960, 600)
+        
+        self.tiles = {}  # {原始代號: SparklineTile}
+        self.columns = 0
+        self.layout_dirty = False
+        self.fetch_worker = None
+        self.dark_mode = False
+        
+        layout = QVBoxLayout(self)
+        self.scroll_area = QtWidgets.QScrollArea()
+        self.scroll_area.setWidgetResizable(True)
+        self.container = QtWidgets.QWidget()
+        self.grid = QGridLayout(self.container)
+        self.grid.setSpacing(8)
+        self.grid.setAlignment(QtCore.Qt.AlignTop | QtCore.Qt.AlignLeft)
+        self.scroll_area.setWidget(self.container)
+        layout.addWidget(self.scroll_area)
+        self.scroll_area.viewport().installEventFilter(self)
+        
+        # 所有卡片共用同一個計時器，而不是每張卡片各自更新
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        
+        self.set_codes(codes or [])
+    
+    def set_codes(self, codes):
+        """設定要顯示的股票清單，沿用已存在的卡片"""
+        codes = [code.replace(".TWO", "").replace(".TW", "") for code in codes]
+        for code in list(self.tiles):
+            if code not in codes:
+                tile = self.tiles.pop(code)
+                self.grid.removeWidget(tile)
+                tile.deleteLater()
+        for code in codes:
+            if code not in self.tiles:
+                tile = SparklineTile(code)
+                tile.set_dark_mode(self.dark_mode)
+                self.tiles[code] = tile
+        self.layout_dirty = True  # 卡片有增減時必須重新排列，避免留下空格
+        self.relayout()
+        if self.isVisible():
+            self.refresh()
+    
+    def set_dark_mode(self, dark_mode):
+        """切換深色/淺色配色"""
+        self.dark_mode = dark_mode
+        for tile in self.tiles.values():
+            tile.set_dark_mode(dark_mode)
+    
+    def relayout(self):
+        """依視窗寬度重新排列卡片"""
+        spacing = self.grid.spacing()
+        width = self.scroll_area.viewport().width()
+        columns = max(1, width // (SparklineTile.TILE_WIDTH + spacing))
+        if columns == self.columns and not self.layout_dirty:
+            return
+        self.columns = columns
+        self.layout_dirty = False
+        for tile in self.tiles.values():
+            self.grid.removeWidget(tile)
+        for index, tile in enumerate(self.tiles.values()):
+            self.grid.addWidget(tile, index // columns, index % columns)
+    
+    def refresh(self):
+        """由共用排程觸發，一次抓取所有卡片的數據"""
+        if not self.tiles:
+            return
+        if self.fetch_worker is not None and self.fetch_worker.isRunning():
+            return
+        
+        self.fetch_worker = FavoritesFetchWorker(list(self.tiles), self.PERIOD)
+        self.fetch_worker.tile_ready.connect(self.on_tile_ready)
+        self.fetch_worker.tile_failed.connect(self.on_tile_failed)
+        self.fetch_worker.start()
+    
+    def on_tile_ready(self, code, data):
+        """更新單一卡片（資料沒變的卡片不會重繪）"""
+        tile = self.tiles.get(code)
+        if tile is None:
+            return
+        tile.set_data(data['stock_name'], float(data['current_price']),
+                      float(data['change_pct']), data['hist']['Close'].to_numpy())
+    
+    def on_tile_failed(self, code, error_msg):
+        """單一卡片抓取失敗"""
+        tile = self.tiles.get(code)
+        if tile is not None:
+            tile.set_error(error_msg)
+    
+    def eventFilter(self, obj, event):
+        """捲動區域大小改變時重新排列卡片"""
+        if obj is self.scroll_area.viewport() and event.type() == QtCore.QEvent.Resize:
+            self.relayout()
+        return super().eventFilter(obj, event)
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.timer.start(market_clock.interval(self.REFRESH_INTERVAL))
+    
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.timer.stop()
+    
+    def closeEvent(self, event):
+        self.timer.stop()
+        if self.fetch_worker is not None and self.fetch_worker.isRunning():
+            self.fetch_worker.requestInterruption()
+            self.fetch_worker.wait()
+        super().closeEvent(event)
+
+
+class StreamingCovariance:
+    """以 Welford 演算法逐筆更新多檔報酬率的平均與共變異數，可移除最舊一筆（滑動視窗）"""
+    
+    def __init__(self, size):
+        self.n = 0
+        self.mean = np.zeros(size)
+        self.m2 = np.zeros((size, size))  # 離均差乘積和
+    
+    def reset(self, rows):
+        """一次以整批資料初始化"""
+        rows = np.asarray(rows, dtype=float)
+        self.n = len(rows)
+        self.mean = rows.mean(axis=0) if self.n else np.zeros(rows.shape[1])
+        centered = rows - self.mean
+        self.m2 = centered.T @ centered
+    
+    def add(self, x):
+        """加入一筆報酬率向量"""
+        self.n += 1
+        delta = x - self.mean
+        self.mean += delta / self.n
+        self.m2 += np.outer(delta, x - self.mean)
+    
+    def remove(self, x):
+        """移除一筆之前加入過的報酬率向量"""
+        if self.n <= 1:
+            self.reset(np.empty((0, len(self.mean))))
+            return
+        old_mean = (self.n * self.mean - x) / (self.n - 1)
+        self.m2 -= np.outer(x - old_mean, x - self.mean)
+        self.mean = old_mean
+        self.n -= 1
+    
+    def covariance(self):
+        """樣本共變異數矩陣"""
+        if self.n < 2:
+            return np.full(self.m2.shape, np.nan)
+        return self.m2 / (self.n - 1)
+
+
+class RiskModel:
+    """以對齊後的日報酬率計算相關係數、Beta、波動率與投資組合 VaR"""
+    
+    TRADING_DAYS = 252
+    Z_95 = 1.645  # 單尾 95% 信賴水準
+    
+    def __init__(self, window=60):
+        self.window = window  # 滑動視窗長度（交易日）
+        self.symbols = []
+        self.last_date = None
+        self.rows = []  # 視窗內的報酬率向量（由舊到新）
+        self.row_dates = []  # 每一列報酬率對應的日期
+        self.accumulator = None
+    
+    def update(self, closes):
+        """輸入對齊後的收盤價（日期 x 股票），只把新的交易日加入累計器"""
+        closes = closes.dropna()
+        values = closes.to_numpy(dtype=float)
+        returns = values[1:] / values[:-1] - 1
+        dates = closes.index[1:]
+        
+        # 某檔股票最新一根 K 棒暫時缺漏時，對齊後的資料會比上次舊：略過本次更新，不讓日期倒退
+        if self.last_date is not None and len(dates) and dates[-1] < self.last_date:
+            return
+        
+        symbols = list(closes.columns)
+        incremental = (
+            symbols == self.symbols and self.accumulator is not None and self.last_date is not None
+            and bool(self.row_dates) and self.row_dates[-1] == self.last_date
+        )
+        if not incremental:
+            # 股票組合改變或尚無資料時整批重算
+            self.symbols = symbols
+            self.rows = list(returns[-self.window:])
+            self.row_dates = list(dates[-self.window:])
+            self.accumulator = StreamingCovariance(len(symbols))
+            self.accumulator.reset(returns[-self.window:])
+        else:
+            # 當日 K 棒盤中仍會變動：同一天的報酬率用最新值取代，不重複加入
+            same_day = dates == self.last_date
+            if same_day.any():
+                row = returns[same_day][-1]
+                self.accumulator.remove(self.rows[-1])
+                self.accumulator.add(row)
+                self.rows[-1] = row
+            newer = dates > self.last_date
+            for date, row in zip(dates[newer], returns[newer]):
+                self.accumulator.add(row)
+                self.rows.append(row)
+                self.row_dates.append(date)
+                if len(self.rows) > self.window:
+                    self.accumulator.remove(self.rows.pop(0))
+                    self.row_dates.pop(0)
+        
+        if len(dates):
+            self.last_date = dates[-1]
+    
+    def covariance(self):
+        return self.accumulator.covariance()
+    
+    def volatility(self):
+        """年化波動率"""
+        return np.sqrt(np.diag(self.covariance()) * self.TRADING_DAYS)
+    
+    def correlation(self):
+        """相關係數矩陣"""
+        cov = self.covariance()
+        std = np.sqrt(np.diag(cov))
+        return cov / np.outer(std, std)
+    
+    def beta(self, benchmark):
+        """各股票相對於基準的 Beta"""
+        cov = self.covariance()
+        index = self.symbols.index(benchmark)
+        return cov[:, index] / cov[index, index]
+    
+    def value_at_risk(self, weights=None):
+        """投資組合單日 95% 參數法 VaR（佔投資組合價值的比例，預設等權重）"""
+        cov = self.covariance()
+        if weights is None:
+            weights = np.full(len(self.symbols), 1 / len(self.symbols))
+        return self.Z_95 * np.sqrt(weights @ cov @ weights)
+
+
+class ArrayTableModel(QtCore.QAbstractTableModel):
+    """以 NumPy 陣列為資料的表格模型，只有畫面上看得到的格子才會被格式化"""
+    
+    def __init__(self, fmt="{:.2f}", colored=False):
+        super().__init__()
+        self.values = np.empty((0, 0))
+        self.row_labels = []
+        self.column_labels = []
+        self.fmt = fmt
+        self.colored = colored  # 依數值（-1 ~ 1）上色
+    
+    def set_values(self, values, row_labels, column_labels):
+        """更新資料；大小不變時只通知內容改變"""
+        if values.shape == self.values.shape and row_labels == self.row_labels and column_labels == self.column_labels:
+            self.values = values
+            self.dataChanged.emit(self.index(0, 0), self.index(values.shape[0] - 1, values.shape[1] - 1))
+            return
+        self.beginResetModel()
+        self.values = values
+        self.row_labels = row_labels
+        self.column_labels = column_labels
+        self.endResetModel()
+    
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return self.values.shape[0]
+    
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return self.values.shape[1]
+    
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        value = self.values[index.row(), index.column()]
+        if role == QtCore.Qt.DisplayRole:
+            return "-" if np.isnan(value) else self.fmt.format(value)
+        if role == QtCore.Qt.TextAlignmentRole:
+            return int(QtCore.Qt.AlignRight | QtCore.Qt.AlignVCenter)
+        if role == QtCore.Qt.BackgroundRole and self.colored and not np.isnan(value):
+            # 正相關偏紅、負相關偏綠
+            strength = int(min(abs(value), 1.0) * 120)
+            if value >= 0:
+                return QtGui.QColor(255, 255 - strength, 255 - strength)
+            return QtGui.QColor(255 - strength, 255, 255 - strength)
+        return None
+    
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role != QtCore.Qt.DisplayRole:
+            return None
+        if orientation == QtCore.Qt.Horizontal:
+            return self.column_labels[section]
+        return self.row_labels[section]
+
+
+class RiskPanel(QtWidgets.QWidget):
+    """我的最愛風險分析：相關係數矩陣、對 0050 的滾動 Beta、波動率與投資組合 VaR"""
+    
+    REFRESH_INTERVAL = 60000  # 毫秒
+    PERIOD = "1y"  # 日 K
+    BENCHMARK = "0050"
+    
+    def __init__(self, codes=None):
+        super().__init__()
+        self.setWindowTitle("風險分析")
+        self.resize(900, 700)
+        
+        self.codes = []
+        self.fetch_worker = None
+        self.pending = {}  # {原始代號: 收盤價}，本輪抓取中的結果
+        self.benchmark_added = False  # 基準是否為自動加入（不屬於投資組合）
+        self.model = RiskModel()
+        
+        layout = QVBoxLayout(self)
+        self.label_summary = QtWidgets.QLabel("載入中...")
+        self.label_summary.setStyleSheet("font-size: 14px; font-weight: bold;")
+        layout.addWidget(self.label_summary)
+        
+        self.stats_model = ArrayTableModel()
+        self.stats_view = QtWidgets.QTableView()
+        self.stats_view.setModel(self.stats_model)
+        self.stats_view.setMaximumHeight(100)
+        layout.addWidget(self.stats_view)
+        
+        layout.addWidget(QtWidgets.QLabel("相關係數矩陣"))
+        self.corr_model = ArrayTableModel(colored=True)
+        self.corr_view = QtWidgets.QTableView()
+        self.corr_view.setModel(self.corr_model)
+        self.corr_view.horizontalHeader().setDefaultSectionSize(60)
+        layout.addWidget(self.corr_view)
+        
+        self.timer = QtCore.QTimer(self)
+        self.timer.timeout.connect(self.refresh)
+        
+        self.set_codes(codes or [])
+    
+    def set_codes(self, codes):
+        """設定要分析的股票（會自動加入基準 0050）"""
+        codes = [code.replace(".TWO", "").replace(".TW", "") for code in codes]
+        self.benchmark_added = self.BENCHMARK not in codes
+        if self.benchmark_added:
+            codes.append(self.BENCHMARK)
+        if codes != self.codes:
+            self.codes = codes
+            if self.isVisible():
+                self.refresh()
+    
+    def refresh(self):
+        """抓取所有股票的日 K，完成後更新風險指標"""
+        if self.fetch_worker is not None and self.fetch_worker.isRunning():
+            return
+        
+        self.pending = {}
+        self.fetch_worker = FavoritesFetchWorker(self.codes, self.PERIOD)
+        self.fetch_worker.tile_ready.connect(self.on_data_ready)
+        self.fetch_worker.finished.connect(self.on_fetch_finished)
+        self.fetch_worker.start()
+    
+    def on_data_ready(self, code, data):
+        """收集單一股票的收盤價"""
+        self.pending[code] = data['hist']['Close']
+    
+    def on_fetch_finished(self):
+        """所有股票抓取完成，對齊日期後更新模型"""
+        if self.BENCHMARK not in self.pending or len(self.pending) < 2:
+            self.label_summary.setText("資料不足，無法計算風險指標")
+            return
+        
+        # 各市場時區不同：先轉成當地交易日再對齊，避免換算 UTC 後日期錯開
+        codes = [code for code in self.codes if code in self.pending]
+        series = []
+        for code in codes:
+            close = self.pending[code].copy()
+            if close.index.tz is not None:
+                close.index = close.index.tz_localize(None)
+            close.index = close.index.normalize()
+            series.append(close[~close.index.duplicated(keep='last')])
+        closes = pd.concat(series, axis=1, keys=codes, sort=True)
+        self.update_risk(closes)
+    
+    def update_risk(self, closes):
+        """以對齊後的收盤價更新所有風險指標"""
+        self.model.update(closes)
+        if self.model.accumulator.n < 2:
+            self.label_summary.setText("資料不足，無法計算風險指標")
+            return
+        
+        symbols = self.model.symbols
+        holdings = [i for i, code in enumerate(symbols)
+                    if code != self.BENCHMARK or not self.benchmark_added or len(symbols) == 1]
+        weights = np.zeros(len(symbols))
+        weights[holdings] = 1 / len(holdings)
+        var = self.model.value_at_risk(weights)
+        
+        self.label_summary.setText(
+            f"等權重投資組合單日 VaR (95%): {var * 100:.2f}%    "
+            f"視窗: {self.model.accumulator.n} 個交易日    "
+            f"資料日期: {self.model.last_date:%Y-%m-%d}"
+        )
+        stats = np.vstack([self.model.volatility() * 100, self.model.beta(self.BENCHMARK)])
+        self.stats_model.set_values(stats, ["年化波動率 (%)", f"Beta ({self.BENCHMARK})"], symbols)
+        self.corr_model.set_values(self.model.correlation(), symbols, symbols)
+    
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self.timer.start(market_clock.interval(self.REFRESH_INTERVAL))
+    
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.timer.stop()
+    
+    def closeEvent(self, event):
+        self.timer.stop()
+        if self.fetch_worker is not None and self.fetch_worker.isRunning():
+            self.fetch_worker.requestInterruption()
+            self.fetch_worker.wait()
+        super().closeEvent(event)
+
+
+def process_rss():
+    """目前行程的常駐記憶體 (bytes)，無法取得時回傳 None"""
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def process_threads():
+    """目前行程的執行緒數量（包含 Qt 建立的執行緒）"""
+    try:
+        import psutil
+        return psutil.Process().num_threads()
+    except ImportError:
+        pass
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('Threads:'):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return threading.active_count()
+
+
+class ResourceTelemetry:
+    """定期取樣記憶體、執行緒、QObject、圖表物件數量與更新延遲，用來觀察長時間執行是否有洩漏"""
+    
+    METRICS = ('rss', 'threads', 'qobjects', 'wrappers', 'artists', 'latency')
+    MIN_SAMPLES = 6  # 略過暖機期後至少需要的樣本數
+    
+    # 判定「持續成長」的容許值：(絕對值, 相對於初期的比例)
+    GROWTH_TOLERANCE = {
+        'rss': (8 * 1024 * 1024, 0.05),
+        'threads': (0, 0),
+        'qobjects': (0, 0),
+        'wrappers': (0, 0),
+        'artists': (0, 0),
+        'latency': (0.005, 0.5),
+    }
+    
+    live_workers = 0  # 尚未銷毀的後台執行緒物件（C++ 端）
+    
+    @classmethod
+    def track(cls, obj):
+        """追蹤物件的建立與銷毀（銷毀時 Qt 會送出 destroyed 信號）"""
+        cls.live_workers += 1
+        obj.destroyed.connect(cls._untrack)
+    
+    @classmethod
+    def _untrack(cls, *args):
+        cls.live_workers -= 1
+    
+    def __init__(self, figure=None, max_samples=1000, deep=False):
+        self.figure = figure
+        self.deep = deep  # 是否掃描整個 Python heap 計算 QObject 包裝物件（較慢，僅供壓力測試）
+        self.samples = deque(maxlen=max_samples)
+        self.latencies = deque(maxlen=50)  # 最近幾次更新的延遲（秒）
+    
+    def record_latency(self, seconds):
+        """記錄一次更新的延遲"""
+        self.latencies.append(seconds)
+    
+    def live_qobjects(self):
+        """目前存活的元件數量，加上尚未銷毀的後台執行緒
+        （不用 findChildren 掃描所有 QObject：Qt 內部短暫存在的動畫物件會留下失效的 Python 包裝物件）"""
+        app = QtWidgets.QApplication.instance()
+        widgets = len(app.allWidgets()) if app is not None else 0
+        return widgets + self.live_workers
+    
+    @staticmethod
+    def live_wrappers():
+        """Python heap 中仍對應到存活 C++ 物件的 QObject 包裝物件數量（掃描整個 heap，較慢）"""
+        return sum(1 for obj in gc.get_objects() if isinstance(obj, QtCore.QObject) and shiboken6.isValid(obj))
+    
+    def sample(self):
+        """取樣一次並回傳結果"""
+        sample = {
+            'time': time.monotonic(),
+            'rss': process_rss(),
+            'threads': process_threads(),
+            'qobjects': self.live_qobjects(),
+            'wrappers': self.live_wrappers() if self.deep else None,
+            'artists': len(self.figure.findobj()) if self.figure is not None else None,
+            'latency': sum(self.latencies) / len(self.latencies) if self.latencies else None,
+        }
+        self.samples.append(sample)
+        return sample
+    
+    def summary(self, sample=None):
+        """單行文字摘要（顯示在狀態列）"""
+        sample = sample or (self.samples[-1] if self.samples else self.sample())
+        rss = f"{sample['rss'] / 1024 / 1024:.1f} MB" if sample['rss'] is not None else "-"
+        latency = f"{sample['latency'] * 1000:.0f} ms" if sample['latency'] is not None else "-"
+        return (f"RSS: {rss}  執行緒: {sample['threads']}  QObject: {sample['qobjects']}  "
+                f"圖表物件: {sample['artists']}  更新延遲: {latency}")
+    
+    def growing_metrics(self, warmup=0.2):
+        """找出持續成長的指標：略過暖機期後分成三段，中位數逐段上升且超過容許值即視為成長。
+        樣本不足以判斷時回傳 None"""
+        samples = list(self.samples)[int(len(self.samples) * warmup):]
+        if len(samples) < self.MIN_SAMPLES:
+            return None
+        
+        growing = {}
+        for metric in self.METRICS:
+            values = [s[metric] for s in samples if s[metric] is not None]
+            if len(values) < self.MIN_SAMPLES:
+                continue
+            third = len(values) // 3
+            first, middle, last = (float(np.median(part)) for part in
+                                   (values[:third], values[third:-third], values[-third:]))
+            absolute, relative = self.GROWTH_TOLERANCE[metric]
+            if first < middle < last and last - first > max(absolute, relative * abs(first)):
+                growing[metric] = (first, last)
+        return growing
+
+
+def run_soak(app, window, cycles, samples=30):
+    """連續執行多次自動更新並取樣資源使用量，沒有指標持續成長時回傳 True"""
+    telemetry = window.telemetry
+    telemetry.deep = True
+    sample_every = max(1, cycles // samples)  # 不論次數多少都取得足夠樣本
+    
+    for cycle in range(cycles):
+        quote_cache.clear()  # 每次都走完整的抓取流程
+        window.search_stock(is_auto=True)
+        if window.fetch_worker is not None:
+            window.fetch_worker.wait()
+        app.processEvents()
+        QtCore.QCoreApplication.sendPostedEvents(None, QtCore.QEvent.DeferredDelete)
+        
+        if cycle % sample_every == 0:
+            gc.collect()
+            sample = telemetry.sample()
+            print(f"[soak {cycle}/{cycles}] {telemetry.summary(sample)}")
+    
+    growing = telemetry.growing_metrics()
+    if growing is None:
+        print(f"[soak] 失敗：樣本數 {len(telemetry.samples)} 不足以判斷，請增加更新次數")
+        return False
+    for metric, (first, last) in growing.items():
+        print(f"[soak] {metric} 持續成長: {first:.6g} -> {last:.6g}")
+    print("[soak] 失敗" if growing else "[soak] 通過")
+    return not growing
+
+
 class StockApp(QtWidgets.QMainWindow):
-    def __init__(self):
+    def __init__(self, code="2330", period="1mo", quiet=False):
         super().__init__()
         
         # 1. 載入 UI
@@ -299,13 +1421,18 @@ class StockApp(QtWidgets.QMainWindow):
         # 5. 設定時鐘計時器
         self.clock_timer = QtCore.QTimer()
         self.clock_timer.timeout.connect(self.update_clock)
-        self.clock_timer.start(1000)
+        # 時鐘只顯示到秒，加速重播時也不需要比 100 毫秒更頻繁地重繪
+        self.clock_timer.start(max(market_clock.interval(1000), 100))
 
         # 6. 初始化後台執行緒變數
         self.fetch_worker = None
         
         # 7. 設定當前時間區間（預設 1 個月）
-        self.current_period = "1mo"
+        self.current_period = period
+        
+        # 重播/壓力測試時不跳出任何對話框，警報只記錄不寫回檔案
+        self.quiet = quiet
+        self.replay_targets = deque()  # 重播時輪流查詢的 (股票代號, 時間區間)
 
         # 8. 初始化我的最愛功能
         self.favorites_file = "favorites.json"
@@ -317,6 +1444,13 @@ class StockApp(QtWidgets.QMainWindow):
         self.price_alerts = self.load_alerts()  # {stock_code: {"target": price, "type": "above/below"}}
         self.last_update_time = None  # 最後更新時間
         
+        # 初始化資源監控（顯示在狀態列；先建立狀態列，避免之後才出現的物件被誤判為成長）
+        self.statusBar()
+        self.telemetry = ResourceTelemetry(self.figure)
+        self.telemetry_timer = QtCore.QTimer()
+        self.telemetry_timer.timeout.connect(self.update_telemetry)
+        self.telemetry_timer.start(10000)
+        
         # 初始化深色模式
         self.dark_mode = False
         self.setup_theme()
@@ -338,6 +1472,12 @@ class StockApp(QtWidgets.QMainWindow):
         # 綁定計算機按鈕
         self.ui.btn_calculator.clicked.connect(self.open_calculator)
         
+        # 綁定我的最愛總覽按鈕
+        self.ui.btn_dashboard.clicked.connect(self.open_dashboard)
+        
+        # 綁定風險分析按鈕
+        self.ui.btn_risk.clicked.connect(self.open_risk_panel)
+        
         # 11. 綁定時間區間按鈕
         self.ui.btn_1d.clicked.connect(lambda: self.change_period("1d"))
         self.ui.btn_1w.clicked.connect(lambda: self.change_period("1w"))
@@ -346,23 +1486,39 @@ class StockApp(QtWidgets.QMainWindow):
         self.ui.btn_1y.clicked.connect(lambda: self.change_period("1y"))
 
         # 預設執行一次查詢
-        self.ui.input_code.setText("2330")
+        self.ui.input_code.setText(code)
         self.search_stock()
         
         # 初始化計算機視窗參考
         self.calculator_window = None
+        
+        # 初始化我的最愛總覽視窗參考
+        self.dashboard_window = None
+        
+        # 初始化風險分析視窗參考
+        self.risk_window = None
 
     def update_clock(self):
-        now = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        now = market_clock.now().strftime("%Y-%m-%d %H:%M:%S")
         self.ui.label_time.setText(f"Time: {now}")
 
+    def update_telemetry(self):
+        """取樣資源使用量並顯示在狀態列"""
+        self.statusBar().showMessage(self.telemetry.summary(self.telemetry.sample()))
+
     def toggle_timer(self):
         if self.ui.chk_auto.isChecked():
-            self.timer.start(10000) # 每 10 秒更新一次
+            self.timer.start(market_clock.interval(10000)) # 每 10 秒更新一次
         else:
             self.timer.stop()
 
     def auto_refresh_logic(self):
+        # 重播時依序輪流查詢錄製檔中的每一檔股票
+        if self.replay_targets and not (self.fetch_worker is not None and self.fetch_worker.isRunning()):
+            code, period = self.replay_targets[0]
+            self.replay_targets.rotate(-1)
+            self.ui.input_code.setText(code)
+            self.current_period = period
         self.search_stock(is_auto=True)
 
     def search_stock(self, is_auto=False):
@@ -388,7 +1544,6 @@ class StockApp(QtWidgets.QMainWindow):
 
     def on_stock_data_ready(self, data, is_auto):
         """當後台執行緒完成數據請求，更新 UI"""
-        import time
         end_time = time.time()
         start_time = data.get('start_time', end_time)
         elapsed_time = end_time - start_time
@@ -406,7 +1561,7 @@ class StockApp(QtWidgets.QMainWindow):
         period = data.get('period', '1mo')
         
         # 更新最後更新時間
-        self.last_update_time = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.last_update_time = market_clock.now().strftime("%Y-%m-%d %H:%M:%S")
         
         # 更新當前股票代號
         self.current_stock = final_code
@@ -428,13 +1583,15 @@ class StockApp(QtWidgets.QMainWindow):
         if change == 0: color = "#666666"
         self.ui.label_price.setStyleSheet(f"color: {color}; font-weight: bold;")
 
+        cache_stats = quote_cache.stats()
         stats_text = (
             f"Open:       {day_open:>8.2f}\n"
             f"High:       {day_high:>8.2f}\n"
             f"Low:        {day_low:>8.2f}\n"
             f"Prev Close: {prev_close:>8.2f}\n"
             f"Change:     {change:>8.2f} ({change_pct:+.2f}%)\n"
-            f"\n最後更新: {self.last_update_time}"
+            f"\n最後更新: {self.last_update_time}\n"
+            f"快取: 命中 {cache_stats['hits']} / 未命中 {cache_stats['misses']} / 合併 {cache_stats['coalesced']}"
         )
         self.ui.label_stats.setText(stats_text)
 
@@ -524,10 +1681,15 @@ class StockApp(QtWidgets.QMainWindow):
         self.figure.autofmt_xdate(rotation=45)
         self.figure.tight_layout()
         self.canvas.draw()
+        
+        # 更新延遲包含抓取與重建圖表
+        self.telemetry.record_latency(time.time() - start_time)
 
     def on_stock_error(self, error_msg, is_auto):
         """當後台執行緒發生錯誤"""
-        if not is_auto:
+        if self.quiet:
+            self.statusBar().showMessage(error_msg)
+        elif not is_auto:
             QtWidgets.QMessageBox.critical(self, "錯誤", error_msg)
 
     def change_period(self, period):
@@ -585,6 +1747,10 @@ class StockApp(QtWidgets.QMainWindow):
         self.save_favorites()
         self.update_favorites_combo()
         self.update_favorite_button()
+        if self.dashboard_window is not None:
+            self.dashboard_window.set_codes(self.favorites)
+        if self.risk_window is not None:
+            self.risk_window.set_codes(self.favorites)
 
     def on_favorite_selected(self, text):
         """當從我的最愛選單中選擇股票"""
@@ -632,9 +1798,12 @@ class StockApp(QtWidgets.QMainWindow):
             msg = f"{stock_code} 已跌破目標價 ${target_price:.2f}\\n當前價格: ${current_price:.2f}"
         
         if triggered:
-            QtWidgets.QMessageBox.information(self, "價格警報", msg)
             # 觸發後移除警報
             del self.price_alerts[stock_code]
+            if self.quiet:
+                print(f"價格警報: {msg}")
+                return
+            QtWidgets.QMessageBox.information(self, "價格警報", msg)
             self.save_alerts()
 
     def set_price_alert(self):
@@ -747,6 +1916,8 @@ class StockApp(QtWidgets.QMainWindow):
         # 重新繪製圖表以套用新主題
         if self.current_stock:
             self.canvas.draw()
+        if self.dashboard_window is not None:
+            self.dashboard_window.set_dark_mode(self.dark_mode)
     
     def open_calculator(self):
         """打開計算機"""
@@ -755,9 +1926,96 @@ class StockApp(QtWidgets.QMainWindow):
         self.calculator_window.show()
         self.calculator_window.raise_()
         self.calculator_window.activateWindow()
+    
+    def closeEvent(self, event):
+        """關閉前等待後台執行緒結束，避免執行緒還在跑時物件被銷毀"""
+        self.timer.stop()
+        if self.fetch_worker is not None and self.fetch_worker.isRunning():
+            self.fetch_worker.wait()
+        if self.dashboard_window is not None:
+            self.dashboard_window.close()
+        if self.risk_window is not None:
+            self.risk_window.close()
+        super().closeEvent(event)
+    
+    def open_dashboard(self):
+        """打開我的最愛總覽"""
+        if not self.favorites:
+            QtWidgets.QMessageBox.information(self, "提示", "我的最愛清單是空的")
+            return
+        
+        if self.dashboard_window is None:
+            self.dashboard_window = SparklineDashboard()
+        self.dashboard_window.set_dark_mode(self.dark_mode)
+        self.dashboard_window.set_codes(self.favorites)
+        self.dashboard_window.show()
+        self.dashboard_window.raise_()
+        self.dashboard_window.activateWindow()
+    
+    def open_risk_panel(self):
+        """打開風險分析"""
+        if not self.favorites:
+            QtWidgets.QMessageBox.information(self, "提示", "我的最愛清單是空的")
+            return
+        
+        if self.risk_window is None:
+            self.risk_window = RiskPanel()
+        self.risk_window.set_codes(self.favorites)
+        self.risk_window.show()
+        self.risk_window.raise_()
+        self.risk_window.activateWindow()
 
 if __name__ == '__main__':
-    app = QtWidgets.QApplication(sys.argv)
-    window = StockApp()
+    parser = argparse.ArgumentParser(description="Stock Dashboard")
+    parser.add_argument("--record", metavar="FILE", help="把抓到的行情錄製到檔案")
+    parser.add_argument("--replay", metavar="FILE", help="離線重播錄製檔，取代即時行情")
+    parser.add_argument("--speed", type=float, default=1.0, help="重播速度倍率 (1-1000)")
+    parser.add_argument("--exit-when-done", action="store_true", help="重播結束後自動關閉（供 CI 使用）")
+    parser.add_argument("--soak", type=int, metavar="CYCLES", help="以測試資料連續更新指定次數，資源持續成長時以非零狀態結束")
+    args, qt_args = parser.parse_known_args()
+    
+    recorder = None
+    replayer = None
+    if args.replay:
+        if not 1 <= args.speed <= 1000:
+            parser.error("--speed 必須介於 1 到 1000 之間")
+        replayer = MarketReplayer(args.replay)
+        market_clock.reset(args.speed, replayer.origin)
+        market_source = replayer
+    elif args.soak:
+        market_source = FixtureMarketSource()
+    if args.record:
+        recorder = MarketRecorder(market_source, args.record)
+        market_source = recorder
+    
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
+    if replayer is not None:
+        targets = replayer.targets()
+        if not targets:
+            parser.error(f"{args.replay} 中沒有可在主畫面回放的資料")
+        code, period = targets[0]
+        window = StockApp(code, period, quiet=True)
+        window.replay_targets = deque(targets[1:] + targets[:1])
+    else:
+        window = StockApp(quiet=bool(args.soak))
     window.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    
+    if args.soak:
+        passed = run_soak(app, window, args.soak)
+        window.close()
+        if recorder is not None:
+            recorder.close()
+        sys.exit(0 if passed else 1)
+    
+    if replayer is not None:
+        # 重播時開啟自動更新，由虛擬時鐘驅動
+        window.ui.chk_auto.setChecked(True)
+        if args.exit_when_done:
+            done_timer = QtCore.QTimer()
+            done_timer.timeout.connect(lambda: replayer.finished and window.close())
+            done_timer.start(100)
+    
+    exit_code = app.exec()
+    if recorder is not None:
+        recorder.close()
+    sys.exit(exit_code)
\ No newline at end of file